@@ -1,22 +1,31 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
+import orjson
+from aiolimiter import AsyncLimiter
+from cachetools import TLRUCache
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from lxml import etree
 import re
-from urllib.parse import urljoin, quote
+import secrets
 import time
-from typing import List, Dict, Optional
+from contextlib import suppress
+from functools import lru_cache
+from urllib.parse import urljoin, quote
+from typing import Callable, List, Dict, Optional, Tuple
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Stremio Addon Manifest
 MANIFEST = {
@@ -35,6 +44,9 @@ MANIFEST = {
     }
 }
 
+# The manifest never changes at runtime, so serialize it once
+MANIFEST_BYTES = orjson.dumps(MANIFEST)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -50,274 +62,423 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# User agent for requests
+# User agent for requests; ask for compressed pages (httpx decodes br via the brotli package)
 HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Encoding': 'gzip, br'
 }
 
-class SubtitleScraper:
-    """Base class for subtitle scrapers"""
-    
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
-    
-    def search(self, imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
-        """Search for subtitles - to be implemented by subclasses"""
-        raise NotImplementedError
+# IMDB IDs are "tt" followed by 7-9 digits; season/episode numbers are small non-negative ints
+IMDB_RE = re.compile(r'tt[0-9]{7,9}')
+MAX_SEASON_EPISODE = 9999
 
-class SubtitrariRoScraper(SubtitleScraper):
-    """Scraper for subtitrari.ro"""
+@lru_cache(maxsize=1024)
+def _parse_id(id: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """Split and validate a Stremio ID (tt1234567 or tt1234567:1:5), raising ValueError if malformed"""
+    imdb_id, sep, rest = id.partition(':')
+    if not IMDB_RE.fullmatch(imdb_id):
+        raise ValueError("Invalid IMDB ID format")
     
-    BASE_URL = "https://www.subtitrari.ro"
+    season = episode = None
+    if sep:
+        s, sep, e = rest.partition(':')
+        e = e.partition(':')[0]
+        # Only plain ASCII digits; int() would also accept ' 1', '1_0' and other scripts' digits
+        if not (s.isascii() and s.isdigit()) or (sep and not (e.isascii() and e.isdigit())):
+            raise ValueError("Invalid season/episode format")
+        season = int(s)
+        episode = int(e) if sep else None
+        if any(n is not None and n > MAX_SEASON_EPISODE for n in (season, episode)):
+            raise ValueError("Invalid season/episode format")
     
-    def search(self, imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
-        subtitles = []
+    return imdb_id, season, episode
+
+MAX_RESULTS = 10
+
+def _text(elem) -> str:
+    """Concatenated, stripped text of an element (like BeautifulSoup's get_text(strip=True))"""
+    return ''.join(t.strip() for t in elem.itertext())
+
+def match_hotposter(elem) -> Optional[Tuple[str, str]]:
+    """Match the hotposter divs subtitrari.ro and titrari.ro use for subtitle entries"""
+    if elem.tag != 'div' or 'hotposter' not in elem.get('class', '').split():
+        return None
+    link_tag = elem.find('.//a')
+    if link_tag is None:
+        return None
+    img_tag = link_tag.find('.//img')
+    if img_tag is None:
+        return None
+    link = link_tag.get('href', '')
+    title = img_tag.get('alt', '').replace('Subtitrare ', '')
+    if not link or not title:
+        return None
+    return link, title
+
+def match_link(href_re: re.Pattern) -> Callable:
+    """Match <a> tags whose href matches href_re"""
+    def match(elem) -> Optional[Tuple[str, str]]:
+        if elem.tag != 'a' or not href_re.search(elem.get('href', '')):
+            return None
+        title = _text(elem)
+        if not title:
+            return None
+        return elem.get('href'), title
+    return match
+
+def match_div_link(class_re: re.Pattern) -> Callable:
+    """Match the first link inside <div> tags whose class matches class_re"""
+    def match(elem) -> Optional[Tuple[str, str]]:
+        if elem.tag != 'div' or not class_re.search(elem.get('class', '')):
+            return None
+        link_tag = elem.find('.//a')
+        if link_tag is None:
+            return None
+        link = link_tag.get('href', '')
+        title = _text(link_tag)
+        if not link or not title:
+            return None
+        return link, title
+    return match
+
+# Supported sites. "search" is formatted with imdb (tt1234567) and imdb_num (1234567);
+# "fallback" entries are only used when "match" finds nothing on the page.
+SITES = [
+    {
+        "key": "subtitrari",
+        "label": "subtitrari.ro",
+        "base": "https://www.subtitrari.ro",
+        "search": "/index.php?page=cauta&z7={imdb_num}",
+        "match": match_hotposter,
+        "fallback": match_link(re.compile(r'subtitrare=')),
+    },
+    {
+        "key": "subsro",
+        "label": "subs.ro",
+        "base": "https://www.subs.ro",
+        "search": "/search.php?q={imdb}",
+        "match": match_link(re.compile(r'subtitrare|subtitle')),
+        "fallback": match_div_link(re.compile(r'subtitle|result')),
+    },
+    {
+        "key": "titrari",
+        "label": "titrari.ro",
+        "base": "https://www.titrari.ro",
+        "search": "/index.php?page=cauta&z7={imdb_num}",
+        "match": match_hotposter,
+        "fallback": match_link(re.compile(r'subtitrare=')),
+    },
+]
+
+def _collect(site: Dict, events, entries: List, fallback: List) -> bool:
+    """Feed parser events to the site's matchers, returning True once enough entries were found"""
+    for _, elem in events:
+        if not isinstance(elem.tag, str):
+            continue
         try:
-            # Remove 'tt' prefix from IMDB ID for this site
-            imdb_num = imdb_id.replace('tt', '')
-            
-            # Search by IMDB ID
-            search_url = f"{self.BASE_URL}/index.php?page=cauta&z7={imdb_num}"
-            
-            logger.info(f"Searching subtitrari.ro with URL: {search_url}")
-            response = self.session.get(search_url, timeout=10)
-            
-            if response.status_code != 200:
-                logger.warning(f"subtitrari.ro returned status {response.status_code}")
-                return subtitles
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all hotposter links (the site uses this class for subtitle entries)
-            hotposters = soup.find_all('div', class_='hotposter')
-            
-            for idx, hotposter in enumerate(hotposters[:10]):  # Limit to 10 results
-                try:
-                    link_tag = hotposter.find('a')
-                    if not link_tag:
-                        continue
-                    
-                    link = link_tag.get('href', '')
-                    img_tag = link_tag.find('img')
-                    
-                    if not img_tag:
-                        continue
-                    
-                    title = img_tag.get('alt', '').replace('Subtitrare ', '')
-                    
-                    if not link or not title:
-                        continue
-                    
-                    # Make absolute URL
-                    if not link.startswith('http'):
-                        link = urljoin(self.BASE_URL, link)
-                    
-                    # Extract subtitle ID from URL
-                    sub_id = f"subtitrari_{idx}_{imdb_id}"
-                    
-                    subtitles.append({
-                        "id": sub_id,
-                        "url": link,
-                        "lang": "rum",  # Romanian language code
-                        "title": f"[subtitrari.ro] {title}"
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error parsing subtitle entry: {e}")
-                    continue
-            
-            # Also try to find results from the "new subtitles" section
-            if len(subtitles) == 0:
-                links = soup.find_all('a', href=re.compile(r'subtitrare='))
-                for idx, link_tag in enumerate(links[:10]):
-                    try:
-                        link = link_tag.get('href', '')
-                        title = link_tag.get_text(strip=True)
-                        
-                        if not link or not title or title in ['', ' ']:
-                            continue
-                        
-                        # Make absolute URL
-                        if not link.startswith('http'):
-                            link = urljoin(self.BASE_URL, link)
-                        
-                        sub_id = f"subtitrari_{idx}_{imdb_id}"
-                        
-                        subtitles.append({
-                            "id": sub_id,
-                            "url": link,
-                            "lang": "rum",
-                            "title": f"[subtitrari.ro] {title}"
-                        })
-                        
-                    except Exception as e:
-                        logger.error(f"Error parsing subtitle link: {e}")
-                        continue
-                    
+            entry = site["match"](elem)
+            if entry:
+                entries.append(entry)
+                if len(entries) >= MAX_RESULTS:
+                    return True
+            elif len(fallback) < MAX_RESULTS:
+                entry = site["fallback"](elem)
+                if entry:
+                    fallback.append(entry)
         except Exception as e:
-            logger.error(f"Error scraping subtitrari.ro: {e}")
-        
-        return subtitles
+            logger.error(f"Error parsing subtitle entry: {e}")
+    return False
 
-class SubsRoScraper(SubtitleScraper):
-    """Scraper for subs.ro"""
+class CircuitOpenError(Exception):
+    """Raised when a site is skipped because its circuit breaker is open"""
+
+class CircuitBreaker:
+    """Skip a site for reset_timeout seconds after fail_max consecutive failures"""
+    
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open = False
+    
+    def check(self):
+        """Raise CircuitOpenError while the circuit is open or a half-open trial is in flight"""
+        if self.opened_at is None:
+            return
+        if self.half_open or time.monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError("too many recent failures, skipping")
+        # Half-open: this caller is the single trial request
+        self.half_open = True
     
-    BASE_URL = "https://www.subs.ro"
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.half_open = False
     
-    def search(self, imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
-        subtitles = []
+    def record_failure(self):
+        self.failures += 1
+        if self.half_open or self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+        self.half_open = False
+    
+    def release_trial(self):
+        """End a half-open trial without a verdict (e.g. cancelled), so the next caller can retry"""
+        self.half_open = False
+
+# Per-site request rate limits and circuit breakers. Limiters live in each worker
+# process, so with N workers a site can see up to N * SITE_RATE_LIMIT requests/second.
+# Waiting for the limiter is capped at LIMITER_TIMEOUT seconds so requests fail fast
+# instead of queueing behind a burst.
+SITE_RATE_LIMIT = 5
+LIMITER_TIMEOUT = 1.0
+LIMITERS = {site["key"]: AsyncLimiter(SITE_RATE_LIMIT, 1) for site in SITES}
+BREAKERS = {site["key"]: CircuitBreaker(fail_max=5, reset_timeout=30) for site in SITES}
+
+async def scrape(site: Dict, client: httpx.AsyncClient, imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
+    """Search a single site for subtitles, failing fast while the site is down"""
+    breaker = BREAKERS[site["key"]]
+    breaker.check()
+    try:
         try:
-            # Search by IMDB ID
-            search_url = f"{self.BASE_URL}/search.php?q={imdb_id}"
-            
-            logger.info(f"Searching subs.ro with URL: {search_url}")
-            response = self.session.get(search_url, timeout=10)
-            
-            if response.status_code != 200:
-                logger.warning(f"subs.ro returned status {response.status_code}")
+            await asyncio.wait_for(LIMITERS[site["key"]].acquire(), LIMITER_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise CircuitOpenError("rate limit reached, skipping")
+        subtitles = await _scrape_site(site, client, imdb_id)
+    except httpx.HTTPError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release_trial()
+        raise
+    breaker.record_success()
+    return subtitles
+
+async def _scrape_site(site: Dict, client: httpx.AsyncClient, imdb_id: str) -> List[Dict]:
+    """Fetch and parse a site's search page; HTTP errors and non-200/404 responses are raised"""
+    subtitles = []
+    try:
+        search_url = site["base"] + site["search"].format(imdb=imdb_id, imdb_num=imdb_id.replace('tt', ''))
+        
+        logger.info(f"Searching {site['label']} with URL: {search_url}")
+        entries, fallback = [], []
+        
+        # Stream the page and stop downloading once enough entries were parsed
+        async with client.stream("GET", search_url) as response:
+            if response.status_code == 404:
+                logger.warning(f"{site['label']} returned status {response.status_code}")
                 return subtitles
+            if response.status_code != 200:
+                # Rate limits, bot blocks and server errors are failures, not "no subtitles",
+                # so raise instead of returning an empty list that would be negative-cached
+                response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find subtitle entries
-            results = soup.find_all('a', href=re.compile(r'subtitrare|subtitle')) or soup.find_all('div', class_=re.compile(r'subtitle|result'))
-            
-            for idx, result in enumerate(results[:10]):
-                try:
-                    if result.name == 'a':
-                        link = result.get('href', '')
-                        title = result.get_text(strip=True)
-                    else:
-                        link_tag = result.find('a')
-                        if not link_tag:
-                            continue
-                        link = link_tag.get('href', '')
-                        title = link_tag.get_text(strip=True)
-                    
-                    if not link or not title:
-                        continue
-                    
-                    # Make absolute URL
-                    if not link.startswith('http'):
-                        link = urljoin(self.BASE_URL, link)
-                    
-                    sub_id = f"subsro_{idx}_{imdb_id}"
-                    
-                    subtitles.append({
-                        "id": sub_id,
-                        "url": link,
-                        "lang": "rum",
-                        "title": f"[subs.ro] {title}"
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error parsing subtitle entry: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Error scraping subs.ro: {e}")
+            parser = etree.HTMLPullParser(events=('end',), encoding=response.charset_encoding)
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                if _collect(site, parser.read_events(), entries, fallback):
+                    break
+            else:
+                parser.close()
+                _collect(site, parser.read_events(), entries, fallback)
         
-        return subtitles
-
-class TitrariRoScraper(SubtitleScraper):
-    """Scraper for titrari.ro"""
+        for idx, (link, title) in enumerate(entries or fallback):
+            # Make absolute URL
+            if not link.startswith('http'):
+                link = urljoin(site["base"], link)
+            
+            subtitles.append({
+                "id": f"{site['key']}_{idx}_{imdb_id}",
+                "url": link,
+                "lang": "rum",  # Romanian language code
+                "title": f"[{site['label']}] {title}"
+            })
+                
+    except httpx.HTTPError:
+        raise
+    except Exception as e:
+        logger.error(f"Error scraping {site['label']}: {e}")
     
-    BASE_URL = "https://www.titrari.ro"
+    return subtitles
+
+# Cache scraped results per site; empty results expire sooner so new uploads show up.
+# With REDIS_URL set the cache lives in Redis and is shared by all workers,
+# otherwise each worker uses its own in-process SUB_CACHE.
+CACHE_TTL = 3600
+EMPTY_CACHE_TTL = 300
+REDIS_URL = os.getenv('REDIS_URL')
+# Keep Redis calls short so an unreachable server degrades to cache misses instead of hanging requests
+REDIS_TIMEOUT = 0.5
+# How long a worker may hold the lock for an in-flight scrape, and how often others check on it
+INFLIGHT_TTL = 30
+INFLIGHT_POLL_INTERVAL = 0.25
+# How long waiters keep reusing a failed scrape instead of retrying it themselves
+INFLIGHT_FAILURE_TTL = 10
+
+# Delete the in-flight lock only if it is still ours; it may have expired and been taken by another worker
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def _cache_ttl(subtitles: List[Dict]) -> int:
+    return CACHE_TTL if subtitles else EMPTY_CACHE_TTL
+
+def _subtitles_ttu(key, subtitles, now):
+    return now + _cache_ttl(subtitles)
+
+SUB_CACHE = TLRUCache(maxsize=4096, ttu=_subtitles_ttu)
+
+def _redis_key(key: Tuple) -> str:
+    site_key, imdb_id, season, episode = key
+    season = '' if season is None else season
+    episode = '' if episode is None else episode
+    return f"sub:v1:{site_key}:{imdb_id}:{season}:{episode}"
+
+def _decode_cached(value: Optional[bytes]) -> Optional[List[Dict]]:
+    """Decode a cached Redis value, treating corrupt or foreign values as misses"""
+    if value is None:
+        return None
+    try:
+        subtitles = orjson.loads(value)
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Ignoring corrupt cached value: {e}")
+        return None
+    return subtitles if isinstance(subtitles, list) else None
+
+async def cache_get_many(redis: Optional[Redis], keys: List[Tuple]) -> List[Optional[List[Dict]]]:
+    """Look up cached results for keys, with None for misses"""
+    if redis is None:
+        return [SUB_CACHE.get(key) for key in keys]
+    try:
+        values = await redis.mget([_redis_key(key) for key in keys])
+    except RedisError as e:
+        logger.error(f"Redis lookup failed: {e}")
+        return [None] * len(keys)
+    return [_decode_cached(value) for value in values]
+
+class InflightScrapeError(Exception):
+    """Raised when the worker holding the in-flight lock for a site failed to scrape it"""
+
+async def scrape_cached(site: Dict, key: Tuple, client: httpx.AsyncClient, redis: Optional[Redis], imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
+    """Scrape a site and cache the result; with Redis, identical scrapes on other workers are coalesced"""
+    if redis is None:
+        subtitles = await scrape(site, client, imdb_id, type, season, episode)
+        SUB_CACHE[key] = subtitles
+        return subtitles
     
-    def search(self, imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> List[Dict]:
-        subtitles = []
-        try:
-            # Remove 'tt' prefix from IMDB ID
-            imdb_num = imdb_id.replace('tt', '')
-            
-            # Search by IMDB ID
-            search_url = f"{self.BASE_URL}/index.php?page=cauta&z7={imdb_num}"
-            
-            logger.info(f"Searching titrari.ro with URL: {search_url}")
-            response = self.session.get(search_url, timeout=10)
-            
-            if response.status_code != 200:
-                logger.warning(f"titrari.ro returned status {response.status_code}")
+    redis_key = _redis_key(key)
+    lock_key = f"{redis_key}:lock"
+    failed_key = f"{redis_key}:failed"
+    token = secrets.token_hex(16)
+    locked = False
+    try:
+        while not locked:
+            locked = await redis.set(lock_key, token, nx=True, ex=INFLIGHT_TTL)
+            if locked:
+                break
+            # Another worker is already scraping this site, wait for its result
+            while await redis.exists(lock_key):
+                await asyncio.sleep(INFLIGHT_POLL_INTERVAL)
+            value, failed = await redis.mget([redis_key, failed_key])
+            subtitles = _decode_cached(value)
+            if subtitles is not None:
                 return subtitles
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all hotposter links (same structure as subtitrari.ro)
-            hotposters = soup.find_all('div', class_='hotposter')
-            
-            for idx, hotposter in enumerate(hotposters[:10]):
-                try:
-                    link_tag = hotposter.find('a')
-                    if not link_tag:
-                        continue
-                    
-                    link = link_tag.get('href', '')
-                    img_tag = link_tag.find('img')
-                    
-                    if not img_tag:
-                        continue
-                    
-                    title = img_tag.get('alt', '').replace('Subtitrare ', '')
-                    
-                    if not link or not title:
-                        continue
-                    
-                    # Make absolute URL
-                    if not link.startswith('http'):
-                        link = urljoin(self.BASE_URL, link)
-                    
-                    sub_id = f"titrari_{idx}_{imdb_id}"
-                    
-                    subtitles.append({
-                        "id": sub_id,
-                        "url": link,
-                        "lang": "rum",
-                        "title": f"[titrari.ro] {title}"
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error parsing subtitle entry: {e}")
-                    continue
-            
-            # Also try direct subtitle links
-            if len(subtitles) == 0:
-                links = soup.find_all('a', href=re.compile(r'subtitrare='))
-                for idx, link_tag in enumerate(links[:10]):
-                    try:
-                        link = link_tag.get('href', '')
-                        title = link_tag.get_text(strip=True)
-                        
-                        if not link or not title or title in ['', ' ']:
-                            continue
-                        
-                        if not link.startswith('http'):
-                            link = urljoin(self.BASE_URL, link)
-                        
-                        sub_id = f"titrari_{idx}_{imdb_id}"
-                        
-                        subtitles.append({
-                            "id": sub_id,
-                            "url": link,
-                            "lang": "rum",
-                            "title": f"[titrari.ro] {title}"
-                        })
-                        
-                    except Exception as e:
-                        logger.error(f"Error parsing subtitle link: {e}")
-                        continue
-                    
-        except Exception as e:
-            logger.error(f"Error scraping titrari.ro: {e}")
-        
+            if failed is not None:
+                raise InflightScrapeError(f"{site['label']} scrape failed on another worker")
+            # The lock expired without a result (e.g. the worker died), try to take it over
+    except RedisError as e:
+        logger.error(f"Redis error while waiting for {site['label']}: {e}")
+    
+    try:
+        subtitles = await scrape(site, client, imdb_id, type, season, episode)
+    except Exception:
+        if locked:
+            with suppress(RedisError):
+                await redis.set(failed_key, 1, ex=INFLIGHT_FAILURE_TTL)
+        raise
+    else:
+        with suppress(RedisError):
+            await redis.set(redis_key, orjson.dumps(subtitles), ex=_cache_ttl(subtitles))
         return subtitles
+    finally:
+        if locked:
+            with suppress(RedisError):
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
 
-# Initialize scrapers
-scrapers = [
-    SubtitrariRoScraper(),
-    SubsRoScraper(),
-    TitrariRoScraper()
-]
+async def search_all(client: httpx.AsyncClient, redis: Optional[Redis], imdb_id: str, type: str, season: Optional[int] = None, episode: Optional[int] = None) -> Tuple[List[Dict], bool]:
+    """
+    Search all platforms concurrently, only scraping sites without a cached result
+    
+    Returns:
+        The merged subtitles and whether every site answered (False if any scrape failed or was skipped)
+    """
+    keys = [(site["key"], imdb_id, season, episode) for site in SITES]
+    cached = await cache_get_many(redis, keys)
+    
+    results = {}
+    misses = []
+    for site, key, subs in zip(SITES, keys, cached):
+        if subs is not None:
+            results[site["key"]] = subs
+        else:
+            misses.append((site, key))
+    
+    scraped = await asyncio.gather(
+        *[scrape_cached(site, key, client, redis, imdb_id, type, season, episode) for site, key in misses],
+        return_exceptions=True
+    )
+    complete = True
+    for (site, _), subs in zip(misses, scraped):
+        if isinstance(subs, BaseException):
+            logger.error(f"Error with scraper {site['label']}: {subs}")
+            complete = False
+            continue
+        results[site["key"]] = subs
+    
+    all_subtitles = []
+    for site in SITES:
+        all_subtitles.extend(results.get(site["key"], []))
+    return all_subtitles, complete
+
+# How often to check whether the client is still waiting for a response
+DISCONNECT_POLL_INTERVAL = 0.5
+
+async def run_until_disconnected(request: Request, coro):
+    """Run coro to completion, cancelling it (and returning None) if the client disconnects first"""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+@app.on_event("startup")
+async def startup():
+    # One keep-alive client shared by all scrapers and requests
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        headers=HEADERS,
+        timeout=10.0,
+        follow_redirects=True
+    )
+    app.state.redis = Redis.from_url(
+        REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT
+    ) if REDIS_URL else None
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+    if app.state.redis is not None:
+        await app.state.redis.aclose()
 
 @app.get("/")
 async def root():
@@ -326,45 +487,50 @@ async def root():
 @app.get("/manifest.json")
 async def get_manifest():
     """Return the addon manifest"""
-    return JSONResponse(content=MANIFEST)
+    return Response(
+        content=MANIFEST_BYTES,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=86400, immutable"}
+    )
 
 @app.get("/subtitles/{type}/{id}.json")
-async def get_subtitles(type: str, id: str):
+async def get_subtitles(request: Request, type: str, id: str):
     """
     Get subtitles for a video
     
     Args:
+        request: Incoming request, used to stop scraping if the client disconnects
         type: Content type (movie or series)
         id: IMDB ID with optional season/episode (e.g., tt1234567 or tt1234567:1:5)
     """
     logger.info(f"Subtitle request - Type: {type}, ID: {id}")
     
-    # Parse ID to extract IMDB ID and optional season/episode
-    parts = id.split(':')
-    imdb_id = parts[0]
-    season = int(parts[1]) if len(parts) > 1 else None
-    episode = int(parts[2]) if len(parts) > 2 else None
-    
-    # Validate IMDB ID format
-    if not imdb_id.startswith('tt'):
-        raise HTTPException(status_code=400, detail="Invalid IMDB ID format")
+    # Parse and validate the ID before doing any network I/O
+    try:
+        imdb_id, season, episode = _parse_id(id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    all_subtitles = []
-    
-    # Search all platforms
-    for scraper in scrapers:
-        try:
-            subs = scraper.search(imdb_id, type, season, episode)
-            all_subtitles.extend(subs)
-            # Add delay to avoid rate limiting
-            time.sleep(0.5)
-        except Exception as e:
-            logger.error(f"Error with scraper {scraper.__class__.__name__}: {e}")
-            continue
+    result = await run_until_disconnected(
+        request, search_all(app.state.http, app.state.redis, imdb_id, type, season, episode)
+    )
+    if result is None:
+        logger.info(f"Client disconnected, cancelled search for {imdb_id}")
+        return Response(status_code=499)
+    all_subtitles, complete = result
     
     logger.info(f"Found {len(all_subtitles)} subtitles for {imdb_id}")
     
-    return JSONResponse(content={"subtitles": all_subtitles})
+    # Let Stremio and any CDN in front of us cache the response as well,
+    # unless a site failed and would hide its subtitles for the whole max-age
+    if complete:
+        cache_control = f"public, max-age={CACHE_TTL if all_subtitles else EMPTY_CACHE_TTL}"
+    else:
+        cache_control = "no-store"
+    return ORJSONResponse(
+        content={"subtitles": all_subtitles},
+        headers={"Cache-Control": cache_control}
+    )
 
 @app.get("/health")
 async def health_check():
@@ -373,4 +539,12 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # Set REDIS_URL to share the subtitle cache between workers
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8001,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )